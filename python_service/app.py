@@ -1,9 +1,21 @@
 import os
-import json
+import time
+import fcntl
+import weakref
+import hashlib
+import threading
 import tempfile
 import shutil
 import subprocess
-from flask import Flask, jsonify, request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Annotated
+import msgspec
+import orjson
+from flask import Flask, Response, request
+
+from tables_fast import fill_rows
 
 # Optional: Google GenAI SDK (pip install google-genai)
 try:
@@ -12,149 +24,528 @@ try:
 except Exception:
     HAS_GENAI = False
 
+GENAI_API_KEY = os.getenv("GENAI_API_KEY")
+GENAI_MODEL = os.getenv("GENAI_MODEL", "gemini-2.5-flash")
+# One client per process, so its HTTP connection pool is reused across requests
+_genai_client = genai.Client(api_key=GENAI_API_KEY) if HAS_GENAI and GENAI_API_KEY else None
+
 app = Flask(__name__)
 
+# Shared read-only default for dict lookups on possibly-missing nested objects
+_EMPTY = {}
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """Serialize with orjson instead of Flask's stdlib-backed jsonify."""
+    return Response(orjson.dumps(payload), status=status, mimetype="application/json")
+
+
+REPO_CACHE_DIR = os.path.expanduser("~/.cpi_repo_cache")
+# Set REPO_CACHE=0 to fall back to a throwaway clone per request
+REPO_CACHE_ENABLED = os.getenv("REPO_CACHE", "1") != "0"
+# Mirrors kept at most; the least recently used ones beyond this are evicted when a new URL is cloned
+REPO_CACHE_MAX_REPOS = int(os.getenv("REPO_CACHE_MAX_REPOS", "64"))
+# Upper bound (seconds) for any single git invocation so a stuck remote cannot pin a worker
+GIT_TIMEOUT = int(os.getenv("GIT_TIMEOUT", "60"))
+JSON_READ_WORKERS = min(8, os.cpu_count() or 1)
+# Throwaway clones (REPO_CACHE=0) go to tmpfs when available, so pack writes never touch disk
+CLONE_TMP_ROOT = os.getenv("CLONE_TMP_ROOT") or ("/dev/shm/cpi_clones" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+
+# In-process half of the repo lock; entries go away once no request holds or waits on them
+_repo_local_locks = weakref.WeakValueDictionary()
+_repo_local_locks_guard = threading.Lock()
+
+
+def _local_repo_lock(key: str) -> threading.Lock:
+    with _repo_local_locks_guard:
+        lock = _repo_local_locks.get(key)
+        if lock is None:
+            lock = _repo_local_locks[key] = threading.Lock()
+        return lock
+
+
+def _try_flock(f) -> bool:
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+@contextmanager
+def _repo_lock(key: str, blocking: bool = True):
+    """Exclusive access to one cached mirror across the threads/greenlets of this worker and
+    across gunicorn worker processes (flock on REPO_CACHE_DIR/<key>.lock).
+    Yields True once held; with blocking=False yields False instead of waiting when it is busy.
+    """
+    # Only one greenlet per process ever waits on the flock; a second one blocking in flock
+    # would stall the gevent hub while the holder could never run to release it
+    local = _local_repo_lock(key)
+    if not local.acquire(blocking):
+        yield False
+        return
+    try:
+        os.makedirs(REPO_CACHE_DIR, exist_ok=True)
+        with open(os.path.join(REPO_CACHE_DIR, f"{key}.lock"), "ab") as f:
+            # Poll rather than block in flock, so a gevent worker keeps serving other requests meanwhile
+            while not _try_flock(f):
+                if not blocking:
+                    yield False
+                    return
+                time.sleep(0.05)
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        local.release()
+
+
+def _decode_output(data) -> str:
+    """Decode captured git output (bytes, or None when not captured)."""
+    return data.decode("utf-8", "replace") if data else ""
+
+
+def _sync_bare_repo(git_url: str, bare_path: str) -> bool:
+    """Create the cached bare mirror on first use, otherwise fetch the latest two commits into it.
+    Returns True when a new mirror was cloned. Caller must hold the repo lock.
+    """
+    if not os.path.isdir(bare_path):
+        # Clone beside the final path and rename into place, so a worker dying mid-clone
+        # never leaves a half-initialized mirror that later requests would try to fetch into
+        partial_path = f"{bare_path}.partial"
+        shutil.rmtree(partial_path, ignore_errors=True)
+        try:
+            # Blobs are fetched lazily, only for the files the diff touches
+            subprocess.run(["git", "clone", "--bare", "--filter=blob:none", "--depth=2", git_url, partial_path], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=GIT_TIMEOUT)
+            os.rename(partial_path, bare_path)
+        except Exception:
+            shutil.rmtree(partial_path, ignore_errors=True)
+            raise
+        return True
+    subprocess.run(["git", "-C", bare_path, "fetch", "--depth=2", "origin", "HEAD"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=GIT_TIMEOUT)
+    subprocess.run(["git", "-C", bare_path, "update-ref", "HEAD", "FETCH_HEAD"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=GIT_TIMEOUT)
+    # mtime marks recent use for _evict_repo_mirrors
+    os.utime(bare_path)
+    return False
+
+
+def _evict_repo_mirrors(keep_key: str):
+    """Remove least recently used mirrors beyond REPO_CACHE_MAX_REPOS; mirrors in use are skipped."""
+    try:
+        with os.scandir(REPO_CACHE_DIR) as it:
+            mirrors = sorted((e.stat().st_mtime, e.name[:-len(".git")]) for e in it if e.is_dir() and e.name.endswith(".git"))
+    except OSError:
+        return
+    excess = len(mirrors) - REPO_CACHE_MAX_REPOS
+    for _, key in mirrors:
+        if excess <= 0:
+            break
+        if key == keep_key:
+            continue
+        with _repo_lock(key, blocking=False) as acquired:
+            if not acquired:
+                continue
+            shutil.rmtree(os.path.join(REPO_CACHE_DIR, f"{key}.git"), ignore_errors=True)
+        excess -= 1
+
+
+def _read_json_blob(repo_path: str, rel: str) -> dict:
+    """Load one changed JSON file from the HEAD tree as {"file_name", "content"}."""
+    try:
+        # Raw bytes straight into orjson, no text decode
+        show_proc = subprocess.run(["git", "-C", repo_path, "show", f"HEAD:{rel}"], check=True, capture_output=True, timeout=GIT_TIMEOUT)
+        return {"file_name": rel, "content": orjson.loads(show_proc.stdout)}
+    except subprocess.CalledProcessError as e:
+        # Deleted in HEAD, or otherwise not readable from the tree
+        return {"file_name": rel, "content": f"Error reading file: {_decode_output(e.stderr).strip()}"}
+    except Exception as e:
+        return {"file_name": rel, "content": f"Error reading file: {e}"}
+
+
+def _diff_head(repo_path: str):
+    """Compute the diff between HEAD~1 and HEAD of a (bare or non-bare) repo.
+    Changed JSON files are read from the HEAD tree, so no worktree is needed.
+    Returns (payload: dict, error: str).
+    """
+    # changed file names + statuses in one NUL-delimited listing (safe for spaces/unicode);
+    # a repo with fewer than 2 commits fails here on the HEAD~1 lookup
+    try:
+        status_proc = subprocess.run(["git", "-C", repo_path, "diff", "--name-status", "-z", "HEAD~1", "HEAD"], check=True, capture_output=True, timeout=GIT_TIMEOUT)
+    except subprocess.CalledProcessError as e:
+        if b"unknown revision" in (e.stderr or b""):
+            return None, "Repository must have at least 2 commits"
+        raise
+
+    changed_files = []
+    json_files = []
+    fields = status_proc.stdout.decode("utf-8", "replace").split("\0")
+    i = 0
+    while i < len(fields) - 1:
+        status = fields[i]
+        # renames/copies carry (old, new) paths; report the new one
+        if status[:1] in ("R", "C"):
+            path = fields[i + 2]
+            i += 3
+        else:
+            path = fields[i + 1]
+            i += 2
+        changed_files.append(path)
+        # Lowercase only the 5-char tail, not the whole path
+        if path[-5:].lower() == ".json":
+            json_files.append(path)
+
+    # git diff HEAD~1..HEAD
+    diff_proc = subprocess.run(["git", "-C", repo_path, "diff", "HEAD~1", "HEAD"], check=True, capture_output=True, timeout=GIT_TIMEOUT)
+    # Decode once ourselves rather than through the locale codec of text=True
+    git_diff_output = diff_proc.stdout.decode("utf-8", "replace")
+
+    # Each read is a git subprocess, so overlap them on threads; a pool is not worth it for a handful
+    if len(json_files) < 4:
+        json_objects = [_read_json_blob(repo_path, rel) for rel in json_files]
+    else:
+        with ThreadPoolExecutor(max_workers=min(JSON_READ_WORKERS, len(json_files))) as ex:
+            json_objects = list(ex.map(partial(_read_json_blob, repo_path), json_files))
+
+    return {"git_diff": git_diff_output, "json_files": json_objects}, None
+
 
 def safe_clone_and_diff(git_url: str):
-    """Clone repo into a temp dir and compute diff between HEAD~1 and HEAD.
-    Returns (git_diff_output: str, changed_json_files: list[dict]).
+    """Bring the repo's cached bare mirror up to date and compute diff between HEAD~1 and HEAD.
+    Returns (payload: dict, tmpdir: str, error: str); tmpdir is only set when the
+    repo cache is disabled and must be removed by the caller.
     """
-    tmpdir = tempfile.mkdtemp(prefix="repo-")
+    if not REPO_CACHE_ENABLED:
+        return _tmp_clone_and_diff(git_url)
+
+    key = hashlib.sha1(git_url.encode("utf-8")).hexdigest()
+    bare_path = os.path.join(REPO_CACHE_DIR, f"{key}.git")
+    try:
+        # Hold the lock across sync + diff + reads so a concurrent fetch from any worker cannot move HEAD underneath us
+        with _repo_lock(key):
+            cloned = _sync_bare_repo(git_url, bare_path)
+            payload, err = _diff_head(bare_path)
+        if cloned:
+            _evict_repo_mirrors(key)
+        return payload, None, err
+    except subprocess.CalledProcessError as e:
+        return None, None, f"Git error: {_decode_output(e.stderr or e.stdout)}"
+    except Exception as e:
+        return None, None, str(e)
+
+
+def _rmtree_in_background(path: str):
+    """Remove a directory on a real OS thread so the response is not held up by the unlinks."""
+    try:
+        from gevent import get_hub, monkey
+        if monkey.is_module_patched("threading"):
+            # threading.Thread would only be a greenlet on the worker's hub; use gevent's native threadpool
+            get_hub().threadpool.spawn(shutil.rmtree, path, True)
+            return
+    except ImportError:
+        pass
+    threading.Thread(target=shutil.rmtree, args=(path,), kwargs={"ignore_errors": True}, daemon=True).start()
+
+
+def _tmp_clone_and_diff(git_url: str):
+    """Clone repo into a temp dir and compute diff between HEAD~1 and HEAD."""
+    os.makedirs(CLONE_TMP_ROOT, exist_ok=True)
+    tmpdir = tempfile.mkdtemp(prefix="repo-", dir=CLONE_TMP_ROOT)
     repo_path = os.path.join(tmpdir, "repo")
     try:
         # Shallow clone for speed
-        subprocess.run(["git", "clone", "--depth", "2", git_url, repo_path], check=True, capture_output=True, text=True)
-        # Ensure repo has at least 2 commits
-        count_proc = subprocess.run(["git", "-C", repo_path, "rev-list", "--count", "HEAD"], check=True, capture_output=True, text=True)
-        commit_count = int(count_proc.stdout.strip() or "0")
-        if commit_count < 2:
-            return None, None, "Repository must have at least 2 commits"
-
-        # git diff HEAD~1..HEAD
-        diff_proc = subprocess.run(["git", "-C", repo_path, "diff", "HEAD~1", "HEAD"], check=True, capture_output=True, text=True)
-        git_diff_output = diff_proc.stdout
-
-        # changed file names
-        name_only_proc = subprocess.run(["git", "-C", repo_path, "diff", "--name-only", "HEAD~1", "HEAD"], check=True, capture_output=True, text=True)
-        changed_files = [p for p in name_only_proc.stdout.strip().split("\n") if p]
-
-        json_files = [p for p in changed_files if p.lower().endswith('.json')]
-        json_objects = []
-        for rel in json_files:
-            abspath = os.path.join(repo_path, rel)
-            try:
-                with open(abspath, 'r') as f:
-                    content = json.load(f)
-                json_objects.append({"file_name": rel, "content": content})
-            except Exception as e:
-                json_objects.append({"file_name": rel, "content": f"Error reading file: {e}"})
-
-        payload = {"git_diff": git_diff_output, "json_files": json_objects}
-        return payload, tmpdir, None
+        subprocess.run(["git", "clone", "--depth", "2", "--no-checkout", git_url, repo_path], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=GIT_TIMEOUT)
+        payload, err = _diff_head(repo_path)
+        return payload, tmpdir, err
     except subprocess.CalledProcessError as e:
-        return None, tmpdir, f"Git error: {e.stderr or e.stdout}"
+        return None, tmpdir, f"Git error: {_decode_output(e.stderr or e.stdout)}"
     except Exception as e:
         return None, tmpdir, str(e)
 
 
+# Prompt headers, pre-encoded once; the request payload is appended as JSON bytes
+_PROMPT_SUMMARY = (
+    b"You are a release documentation assistant. Given a set of JSON changes (only newly added or modified values), "
+    b"write a concise summary of the impact of these changes for a changelog. Focus on what was added or updated, "
+    b"and potential user or system impact. Return STRICT JSON only with this schema (no extra keys, no markdown):\n"
+    b"{\n  \"description\": string\n}\n"
+)
+
+_PROMPT_TABLE = (
+    b"You are a release documentation assistant. Given either a repo JSON change report, a git diff + changed JSON files payload, "
+    b"or an industry-change TEMPLATE (JSON or text), produce a STRICT JSON object with the following schema ONLY (no extra keys, no commentary):\n"
+    b"{\n"
+    b"  \"title\": string,\n"
+    b"  \"description\": string,\n"
+    b"  \"table\": {\n"
+    b"    \"columns\": [string],\n"
+    b"    \"rows\": [[string]]\n"
+    b"  }\n"
+    b"}\n\n"
+    b"Rules: Return ONLY valid JSON for the object above. Do NOT wrap in markdown. Choose clear human-readable columns (e.g., File, Change, Details). Rows must be same length as columns. If information is missing, omit the row or write 'N/A'.\n"
+)
+
+_PROMPT_FILES = (
+    b"You are a release documentation assistant. Given either a repo JSON change report or a git diff + changed JSON files payload, "
+    b"or an industry-change TEMPLATE (JSON or text), produce a STRICT JSON object with the following schema ONLY (no extra keys, no commentary):\n"
+    b"{\n"
+    b"  \"title\": string,\n"
+    b"  \"description\": string,\n"
+    b"  \"files\": [\n"
+    b"    {\n"
+    b"      \"file\": string,\n"
+    b"      \"changeType\": string,  // one of: added|removed|modified|renamed|unknown\n"
+    b"      \"changes\": [string],  // bullet points describing what changed\n"
+    b"      \"notes\": string       // optional human-friendly notes\n"
+    b"    }\n"
+    b"  ]\n"
+    b"}\n\n"
+    b"Rules: Return ONLY valid JSON for the object above. Do NOT wrap in markdown. If content is insufficient, fill with best-effort summaries.\n"
+)
+
+# Strict form of the _PROMPT_FILES schema. Empty names, nulls and unknown keys (e.g. "name", "diff")
+# fail validation on purpose so those responses take the tolerant normalization path instead
+_NonEmptyStr = Annotated[str, msgspec.Meta(min_length=1)]
+
+
+class FileEntry(msgspec.Struct, forbid_unknown_fields=True):
+    file: _NonEmptyStr = "Unknown"
+    changeType: _NonEmptyStr = "unknown"
+    changes: list[str] = []
+    notes: str = ""
+
+
+class FilesResult(msgspec.Struct, forbid_unknown_fields=True):
+    title: str = "AI Documentation"
+    description: str = ""
+    files: list[FileEntry] = []
+
+
+GENAI_CACHE_DIR = os.getenv("GENAI_CACHE_DIR", "/tmp/genai_cache")
+GENAI_CACHE_MAX_BYTES = int(os.getenv("GENAI_CACHE_MAX_BYTES", str(1 << 30)))
+
+
+# Running size estimate of GENAI_CACHE_DIR for this process (None until the first full scan);
+# the directory is only listed when it passes the cap or every GENAI_CACHE_RESCAN_WRITES writes,
+# which also picks up what other workers wrote
+_genai_cache_bytes = None
+_genai_cache_writes = 0
+_genai_cache_guard = threading.Lock()
+GENAI_CACHE_RESCAN_WRITES = 256
+
+
+def _sweep_genai_cache() -> int:
+    """Evict least recently used responses down to 90% of GENAI_CACHE_MAX_BYTES (so the next
+    sweep is not due right away). Returns the remaining cache size in bytes.
+    """
+    entries = []
+    total = 0
+    with os.scandir(GENAI_CACHE_DIR) as it:
+        for e in it:
+            if e.is_file() and e.name.endswith(".json"):
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+    if total <= GENAI_CACHE_MAX_BYTES:
+        return total
+    target = GENAI_CACHE_MAX_BYTES * 9 // 10
+    entries.sort()
+    for _, size, path in entries:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= target:
+            break
+    return total
+
+
+def _account_genai_cache_write(size: int):
+    """Track a cache write and sweep only when the running total says it may be needed."""
+    global _genai_cache_bytes, _genai_cache_writes
+    with _genai_cache_guard:
+        _genai_cache_writes += 1
+        if _genai_cache_bytes is not None:
+            _genai_cache_bytes += size
+        if (_genai_cache_bytes is not None and _genai_cache_bytes <= GENAI_CACHE_MAX_BYTES
+                and _genai_cache_writes % GENAI_CACHE_RESCAN_WRITES):
+            return
+        _genai_cache_bytes = _sweep_genai_cache()
+
+
+def _read_cached(path: str):
+    """Return a cached response, or None on a miss."""
+    try:
+        with open(path, "rb") as f:
+            cached = orjson.loads(f.read())
+        # Bump mtime so the sweep evicts least recently used entries first
+        os.utime(path)
+        return cached
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def _write_cached(path: str, result: dict):
+    try:
+        os.makedirs(GENAI_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        data = orjson.dumps(result)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _account_genai_cache_write(len(data))
+    except OSError:
+        # Caching is best-effort; never fail the request over it
+        pass
+
+
+def cached_generate(client, prompt: bytes, payload, model: str) -> dict:
+    """Call the model, memoizing the response text on disk by (prompt, payload, model).
+    Returns {"text": str} on success, or {"text": None, "raw": repr} when the SDK gave no text
+    (those are never cached).
+    """
+    # Sorted keys make the contents, and so the cache key, independent of dict insertion order
+    contents = prompt + orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    h = hashlib.blake2b(contents, digest_size=16)
+    h.update(model.encode("utf-8"))
+    path = os.path.join(GENAI_CACHE_DIR, f"{h.hexdigest()}.json")
+    cached = _read_cached(path)
+    if cached is not None:
+        return cached
+
+    # Blocking SDK call; gevent workers overlap the wait with other requests. The SDK takes str contents
+    resp = client.models.generate_content(model=model, contents=contents.decode("utf-8"))
+    text = getattr(resp, "text", None)
+    if not text:
+        return {"text": None, "raw": str(resp)}
+
+    result = {"text": text}
+    _write_cached(path, result)
+    return result
+
+
 @app.route("/generate", methods=["POST"])
 def generate():
     """Generate AI documentation from either a provided 'report' JSON (preferred)
     or by cloning a repo when 'git_url' is provided. Returns JSON with 'result'.
     """
     try:
-        data = request.get_json(force=True, silent=False) or {}
+        # Parse the raw body with orjson rather than Flask's stdlib-backed get_json
+        body = request.get_data(cache=False)
+        data = (orjson.loads(body) if body else None) or {}
         report = data.get("report")
         git_url = data.get("git_url")
         template_text = data.get("template")  # raw template text (JSON or free text)
         output_mode = data.get("output", "files")  # 'files' | 'table' | 'multi_tables' | 'summary'
         changes = data.get("changes")  # flattened changes from backend
 
+        template = None
+        if template_text:
+            # If template is JSON, try to parse it; else keep as text
+            parsed_template = None
+            try:
+                parsed_template = orjson.loads(template_text)
+            except Exception:
+                parsed_template = None
+            template = parsed_template if parsed_template is not None else template_text
+
+        # multi_tables renders a JSON template or flattened changes deterministically and never reads
+        # the repo diff, so when the request carries one of those, skip the clone/diff for git_url
+        needs_git = not (output_mode == "multi_tables" and (isinstance(template, dict) or (not template_text and isinstance(changes, list))))
+
         input_payload = None
         tmpdir = None
         if report:
             input_payload = {"report": report}
-        elif git_url:
+        elif git_url and needs_git:
             payload, tmpdir, err = safe_clone_and_diff(git_url)
             if err:
-                return jsonify({"error": err}), 400
+                return json_response({"error": err}, 400)
             input_payload = payload
         elif template_text:
-            # If template is JSON, try to parse it; else keep as text
-            parsed_template = None
-            try:
-                parsed_template = json.loads(template_text)
-            except Exception:
-                parsed_template = None
-            input_payload = {"template": parsed_template if parsed_template is not None else template_text}
+            input_payload = {"template": template}
         elif isinstance(changes, list):
             input_payload = {"changes": changes, "title": data.get("title"), "description": data.get("description")}
         else:
-            return jsonify({"error": "Provide either 'report' or 'git_url'"}), 400
+            return json_response({"error": "Provide either 'report' or 'git_url'"}, 400)
 
         # If no GenAI available, just echo payload keys to prove plumbing
         if not HAS_GENAI:
-            return jsonify({
+            return json_response({
                 "result": {
                     "summary": "GenAI SDK not installed. Echoing input keys.",
                     "keys": list(input_payload.keys())
                 }
-            }), 200
+            }, 200)
 
-        api_key = os.getenv("GENAI_API_KEY")
-        if not api_key:
-            return jsonify({"error": "GENAI_API_KEY not configured"}), 500
+        if _genai_client is None:
+            return json_response({"error": "GENAI_API_KEY not configured"}, 500)
 
-        client = genai.Client(api_key=api_key)
         if output_mode == "multi_tables":
             # Deterministic multi-table renderer (no LLM formatting needed), when possible
+            # Local alias: the per-row encodes below skip the global + attribute lookup
+            dumps = orjson.dumps
             # Case A: template JSON provided -> produce per-top-level-key tables like P31, P463 ...
             if isinstance(input_payload.get("template"), dict):
                 tpl = input_payload["template"]
-                tables = []
+                title = input_payload.get("title") or "Template Tables"
+                description = input_payload.get("description") or "Structured view of template entries by top-level key."
+                # Emit the response incrementally: each table is serialized as soon as it is built, so only
+                # one table's rows are alive as Python objects at a time instead of the whole result graph
+                buf = bytearray(b'{"result":{"title":')
+                buf += orjson.dumps(title)
+                buf += b',"description":'
+                buf += orjson.dumps(description)
+                buf += b',"tables":['
+                first = True
+                col_cache = {}
                 for key, arr in tpl.items():
                     if not isinstance(arr, list):
                         continue
 
-                    # First pass: collect language keys present in labels to define stable columns
+                    # Single pass: collect each entry's fields and the union of label languages together;
+                    # the language columns are only ordered once the traversal is done
+                    d_get = dict.get
                     lang_set = set()
+                    parsed = []
                     for entry in arr:
-                        mainsnak = (entry or {}).get("mainsnak", {})
-                        dv = mainsnak.get("datavalue", {})
-                        if isinstance(dv, dict):
-                            val = dv.get("value")
+                        try:
+                            # Fast path: well-formed entries need no per-level type checks
+                            mainsnak = entry["mainsnak"]
+                            val = mainsnak["datavalue"]["value"]
+                            label_map = {str(lang): str(txt) for lang, txt in val["labels"].items()}
+                            item = (str(mainsnak["property"]), str(mainsnak["datatype"]), str(val["id"]), label_map, str(entry["rank"]))
+                        except (KeyError, TypeError, AttributeError):
+                            # Malformed or partial entry: tolerate missing or oddly typed pieces
+                            entry = entry or _EMPTY
+                            mainsnak = d_get(entry, "mainsnak", _EMPTY)
+                            dv = d_get(mainsnak, "datavalue", _EMPTY)
+                            val = d_get(dv, "value") if isinstance(dv, dict) else None
+                            ent_id = ""
+                            label_map = _EMPTY
                             if isinstance(val, dict):
-                                labels = val.get("labels")
+                                ent_id = str(d_get(val, "id", ""))
+                                labels = d_get(val, "labels")
                                 if isinstance(labels, dict):
-                                    for lang in labels.keys():
-                                        lang_set.add(str(lang))
-                    lang_cols = sorted(list(lang_set))
+                                    label_map = {str(lang): str(txt) for lang, txt in labels.items()}
+                            item = (
+                                str(d_get(mainsnak, "property", "")),
+                                str(d_get(mainsnak, "datatype", "")),
+                                ent_id,
+                                label_map,
+                                str(d_get(entry, "rank", "")),
+                            )
+                        lang_set.update(item[3])
+                        parsed.append(item)
+                    lang_cols = sorted(lang_set)
 
-                    base_cols = ["property", "datatype", "id"]
-                    columns = base_cols + lang_cols + ["rank"]
-                    rows = []
-                    for entry in arr:
-                        mainsnak = (entry or {}).get("mainsnak", {})
-                        prop = mainsnak.get("property", "")
-                        dtype = mainsnak.get("datatype", "")
-                        dv = mainsnak.get("datavalue", {})
-                        val = dv.get("value") if isinstance(dv, dict) else None
-                        ent_id = ""
-                        label_map = {}
-                        if isinstance(val, dict):
-                            ent_id = str(val.get("id", ""))
-                            labels = val.get("labels")
-                            if isinstance(labels, dict):
-                                for lang, txt in labels.items():
-                                    label_map[str(lang)] = str(txt)
-                        rank = (entry or {}).get("rank", "")
-
-                        row = [str(prop), str(dtype), ent_id]
-                        # fill languages in order
-                        for lang in lang_cols:
-                            row.append(label_map.get(lang, ""))
-                        row.append(str(rank))
-                        rows.append(row)
+                    # Keys labelled in the same languages share one columns list
+                    sig = tuple(lang_cols)
+                    columns = col_cache.get(sig)
+                    if columns is None:
+                        columns = col_cache[sig] = ["property", "datatype", "id", *lang_cols, "rank"]
+                    rows = fill_rows(parsed, lang_cols)
 
                     # Fallback if no languages/id present: show raw datavalue
                     if len(columns) == 4 and columns[-1] == "rank" and not any(r[2] for r in rows):
@@ -165,114 +556,78 @@ def generate():
                             prop = mainsnak.get("property", "")
                             dtype = mainsnak.get("datatype", "")
                             dv = mainsnak.get("datavalue", {})
-                            dv_text = json.dumps(dv.get("value"), ensure_ascii=False) if isinstance(dv, dict) else json.dumps(dv, ensure_ascii=False)
+                            dv_text = dumps(dv.get("value")).decode() if isinstance(dv, dict) else dumps(dv).decode()
                             rank = (entry or {}).get("rank", "")
                             rows.append([str(prop), str(dtype), dv_text if dv_text is not None else "", str(rank)])
 
-                    tables.append({"name": key, "columns": columns, "rows": rows})
+                    if not first:
+                        buf += b","
+                    first = False
+                    buf += dumps({"name": key, "columns": columns, "rows": rows})
 
-                result = {
-                    "title": input_payload.get("title") or "Template Tables",
-                    "description": input_payload.get("description") or "Structured view of template entries by top-level key.",
-                    "tables": tables,
-                }
-                return jsonify({"result": result}), 200
+                buf += b"]}}"
+                return Response(bytes(buf), status=200, mimetype="application/json")
 
             # Case B: flattened changes provided -> produce per-file tables
             if isinstance(input_payload.get("changes"), list):
-                tables = []
-                by_file = {}
+                # Rows go straight into their file's table in one pass over the changes
+                rows_by_file = {}
                 for ch in input_payload["changes"]:
-                    file = str(ch.get("file", ""))
-                    by_file.setdefault(file, []).append(ch)
-                for file, items in by_file.items():
-                    columns = ["Path", "New Value"]
-                    rows = []
-                    for ch in items:
-                        rows.append([
-                            str(ch.get("path", "")),
-                            json.dumps(ch.get("after"), ensure_ascii=False)
-                        ])
-                    tables.append({"name": file or "Changes", "columns": columns, "rows": rows})
+                    rows_by_file.setdefault(str(ch.get("file", "")), []).append([
+                        str(ch.get("path", "")),
+                        dumps(ch.get("after")).decode()
+                    ])
+                tables = [{"name": file or "Changes", "columns": ["Path", "New Value"], "rows": rows}
+                          for file, rows in rows_by_file.items()]
                 result = {
                     "title": input_payload.get("title") or "JSON Changes",
                     "description": input_payload.get("description") or "Only the new values after changes.",
                     "tables": tables,
                 }
-                return jsonify({"result": result}), 200
+                return json_response({"result": result}, 200)
 
             # If we cannot deterministically format, fall back to LLM table schema
             output_mode = "table"
 
         if output_mode == "summary":
             # Ask the model to write a concise business-facing summary only
-            prompt = (
-                "You are a release documentation assistant. Given a set of JSON changes (only newly added or modified values), "
-                "write a concise summary of the impact of these changes for a changelog. Focus on what was added or updated, "
-                "and potential user or system impact. Return STRICT JSON only with this schema (no extra keys, no markdown):\n"
-                "{\n  \"description\": string\n}\n"
-            )
-            resp = client.models.generate_content(
-                model=os.getenv("GENAI_MODEL", "gemini-2.5-flash"),
-                contents=prompt + json.dumps(input_payload)
-            )
-            text = getattr(resp, "text", None)
+            gen = cached_generate(_genai_client, _PROMPT_SUMMARY, input_payload, GENAI_MODEL)
+            text = gen.get("text")
             description = ""
             if text:
                 try:
-                    parsed = json.loads(text)
+                    parsed = orjson.loads(text)
                     description = parsed.get("description", "") if isinstance(parsed, dict) else str(parsed)
                 except Exception:
                     description = text
             else:
-                description = str(resp)
+                description = gen.get("raw", "")
 
-            return jsonify({"result": {"description": description}}), 200
+            return json_response({"result": {"description": description}}, 200)
 
         if output_mode == "table":
-            prompt = (
-                "You are a release documentation assistant. Given either a repo JSON change report, a git diff + changed JSON files payload, "
-                "or an industry-change TEMPLATE (JSON or text), produce a STRICT JSON object with the following schema ONLY (no extra keys, no commentary):\n"
-                "{\n"
-                "  \"title\": string,\n"
-                "  \"description\": string,\n"
-                "  \"table\": {\n"
-                "    \"columns\": [string],\n"
-                "    \"rows\": [[string]]\n"
-                "  }\n"
-                "}\n\n"
-                "Rules: Return ONLY valid JSON for the object above. Do NOT wrap in markdown. Choose clear human-readable columns (e.g., File, Change, Details). Rows must be same length as columns. If information is missing, omit the row or write 'N/A'.\n"
-            )
+            prompt = _PROMPT_TABLE
         else:
-            prompt = (
-                "You are a release documentation assistant. Given either a repo JSON change report or a git diff + changed JSON files payload, "
-                "or an industry-change TEMPLATE (JSON or text), produce a STRICT JSON object with the following schema ONLY (no extra keys, no commentary):\n"
-                "{\n"
-                "  \"title\": string,\n"
-                "  \"description\": string,\n"
-                "  \"files\": [\n"
-                "    {\n"
-                "      \"file\": string,\n"
-                "      \"changeType\": string,  // one of: added|removed|modified|renamed|unknown\n"
-                "      \"changes\": [string],  // bullet points describing what changed\n"
-                "      \"notes\": string       // optional human-friendly notes\n"
-                "    }\n"
-                "  ]\n"
-                "}\n\n"
-                "Rules: Return ONLY valid JSON for the object above. Do NOT wrap in markdown. If content is insufficient, fill with best-effort summaries.\n"
-            )
-        # Some SDKs want the whole text in one string
-        resp = client.models.generate_content(
-            model=os.getenv("GENAI_MODEL", "gemini-2.5-flash"),
-            contents=prompt + json.dumps(input_payload)
-        )
+            prompt = _PROMPT_FILES
+        # Some SDKs want the whole text in one string; identical requests are served from the disk cache
+        gen = cached_generate(_genai_client, prompt, input_payload, GENAI_MODEL)
+
+        text = gen.get("text")
+
+        # Well-formed files output is parsed and validated against the schema in one C-level decode
+        if text and output_mode != "table":
+            try:
+                strict = msgspec.json.decode(text, type=FilesResult)
+            except msgspec.MsgspecError:
+                strict = None
+            if strict is not None:
+                return Response(msgspec.json.encode({"result": strict}), status=200, mimetype="application/json")
 
         # Try to parse JSON from the response text
-        text = getattr(resp, "text", None)
         result = None
         if text:
             try:
-                result = json.loads(text)
+                result = orjson.loads(text)
             except Exception:
                 # fallback: treat as plain description
                 if output_mode == "table":
@@ -292,13 +647,13 @@ def generate():
             if output_mode == "table":
                 result = {
                     "title": "AI Documentation",
-                    "description": str(resp),
-                    "table": {"columns": ["Text"], "rows": [[str(resp)]]}
+                    "description": gen.get("raw", ""),
+                    "table": {"columns": ["Text"], "rows": [[gen.get("raw", "")]]}
                 }
             else:
                 result = {
                     "title": "AI Documentation",
-                    "description": str(resp),
+                    "description": gen.get("raw", ""),
                     "files": []
                 }
 
@@ -318,14 +673,10 @@ def generate():
                 columns = ["Text"]
             if not isinstance(rows, list) or not all(isinstance(r, list) for r in rows):
                 rows = []
-            # Ensure each row length matches columns length
-            fixed_rows = []
-            for r in rows:
-                if len(r) < len(columns):
-                    r = r + ["" for _ in range(len(columns) - len(r))]
-                elif len(r) > len(columns):
-                    r = r[:len(columns)]
-                fixed_rows.append([str(x) for x in r])
+            # Ensure each row length matches columns length: pad with a shared tail, then truncate
+            ncols = len(columns)
+            pad = [""] * ncols
+            fixed_rows = [list(map(str, (r + pad)[:ncols])) for r in rows]
             result["table"] = {"columns": columns, "rows": fixed_rows}
         else:
             files = result.get("files")
@@ -347,12 +698,12 @@ def generate():
                 if not isinstance(changes_list, list):
                     # if a diff string or object was provided, stringify
                     if changes_list is None and "diff" in f:
-                        changes_list = [json.dumps(f.get("diff"))]
+                        changes_list = [orjson.dumps(f.get("diff")).decode()]
                     else:
                         changes_list = [str(changes_list)] if changes_list is not None else []
                 notes = f.get("notes")
                 if not isinstance(notes, str):
-                    notes = json.dumps(notes) if notes is not None else ""
+                    notes = orjson.dumps(notes).decode() if notes is not None else ""
                 normalized_files.append({
                     "file": file_name,
                     "changeType": change_type,
@@ -361,17 +712,19 @@ def generate():
                 })
             result["files"] = normalized_files
 
-        return jsonify({"result": result}), 200
+        return json_response({"result": result}, 200)
     except Exception as e:
-        return jsonify({"error": f"Internal error: {e}"}), 500
+        return json_response({"error": f"Internal error: {e}"}, 500)
     finally:
-        # Clean any temp dir created in clone mode
+        # Clean any temp dir created in clone mode, off the request path
         try:
-            if 'tmpdir' in locals() and tmpdir and os.path.isdir(tmpdir):
-                shutil.rmtree(tmpdir, ignore_errors=True)
+            if 'tmpdir' in locals() and tmpdir:
+                _rmtree_in_background(tmpdir)
         except Exception:
             pass
 
 
 if __name__ == "__main__":
+    # Development server only; the container runs gunicorn with gevent workers:
+    #   gunicorn -k gevent -w 4 --worker-connections 64 -b 0.0.0.0:8000 app:app
     app.run(host="0.0.0.0", port=8000)
@@ -0,0 +1,22 @@
+"""Row materialization for the deterministic multi_tables template renderer.
+
+Kept in its own fully annotated module so it can be compiled ahead of time with
+mypyc (``pip install mypy && mypyc tables_fast.py``); the compiled extension is
+picked up by ``import tables_fast`` in place of this file when present.
+"""
+
+Entry = tuple[str, str, str, dict[str, str], str]
+
+
+def fill_rows(parsed: list[Entry], lang_cols: list[str]) -> list[list[str]]:
+    """Turn (property, datatype, id, label_map, rank) tuples into table rows,
+    one label cell per language column in order.
+    """
+    rows: list[list[str]] = []
+    for prop, dtype, ent_id, label_map, rank in parsed:
+        row: list[str] = [prop, dtype, ent_id]
+        for lang in lang_cols:
+            row.append(label_map.get(lang, ""))
+        row.append(rank)
+        rows.append(row)
+    return rows